@@ -1,14 +1,25 @@
 #!/usr/bin/env python3
 import os
+import functools
+import hashlib
 import json
 import textwrap
 from pathlib import Path
-from time import sleep, time
+from time import sleep
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
+from retry_utils import poll_delay
 
 load_dotenv()  # take environment variables from .env file if present
 
+try:
+    import orjson  # optional: faster JSON parsing
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
 
 # running script path
 SCRIPT_PATH = Path(__file__).parent
@@ -32,6 +43,8 @@ CUSTOM_SCHEMA_PATH = SCRIPT_PATH / "custom_schema.json"
 
 
 TIMEOUT = 60  # seconds
+POLL_INITIAL_INTERVAL = 0.5  # seconds; doubled after each poll
+POLL_MAX_INTERVAL = 30  # seconds
 # -----------------------------------------------------------------------------
 
 def print_json(title: str, resp: requests.Response):
@@ -54,6 +67,22 @@ def make_session() -> requests.Session:
         # requests sets Content-Type automatically when using json=...
         "Accept": "application/json",
     })
+    # Absorb throttling and transient server errors instead of failing the run;
+    # Retry waits for Retry-After when the service sends one. POST is left out:
+    # the analyze POST is not idempotent and a 5xx may follow acceptance.
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=16,
+        max_retries=Retry(
+            total=5,
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(["GET", "PUT", "DELETE"]),
+            respect_retry_after_header=True,
+        ),
+    )
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
     return s
 
 def list_analyzers(session: requests.Session):
@@ -74,11 +103,22 @@ def get_analyzer(session: requests.Session, analyzer_id: str):
     #print_json(f"Get analyzer {analyzer_id}", resp)
     return json_resp
 
-def put_analyzer(session: requests.Session, analyzer_id: str, schema_path: Path):
+@functools.lru_cache(maxsize=4)
+def _load_schema(path_str: str, mtime: float) -> dict:
+    """Parse the analyzer schema; cached per (path, mtime) so retries and repeat
+    PUTs reuse it while edits to the file are still picked up."""
+    return _json_loads(Path(path_str).read_bytes())
+
+def schema_hash(schema_path: Path) -> str:
+    return hashlib.sha256(schema_path.read_bytes()).hexdigest()
+
+def put_analyzer(session: requests.Session, analyzer_id: str, schema_path: Path, schema_digest: str | None = None):
     if not schema_path.exists():
         raise FileNotFoundError(f"Schema file not found: {schema_path}")
-    with open(schema_path, "r", encoding="utf-8") as f:
-        payload = json.load(f)
+    payload = _load_schema(str(schema_path), schema_path.stat().st_mtime)
+    if schema_digest:
+        # Record the schema hash in the description so main() can tell when a PUT is unnecessary
+        payload = {**payload, "description": f"{payload.get('description', '')} schema:{schema_digest}".strip()}
 
     url = build_url(f"/contentunderstanding/analyzers/{analyzer_id}")
     # Use json= to send application/json
@@ -91,13 +131,21 @@ def put_analyzer(session: requests.Session, analyzer_id: str, schema_path: Path)
             # 'https://azure-ai-service-anildwa-9030.services.ai.azure.com/contentunderstanding/analyzers/custom_invoice_processing_v1/operations/4ab5cacc-098a-464f-abee-200c71e15a44?api-version=2025-05-01-preview'
             
             print(f"\nAnalyzer creation started. Check status at: {operation_location}")
+            backoff = POLL_INITIAL_INTERVAL
             while True:
                 print("checking operation status...")
-                operation_status = get_operation_status(session, analyzer_id, operation_location)
-                if operation_status['status'] == "Succeeded":
+                operation_status, retry_after = get_operation_status(session, analyzer_id, operation_location)
+                if operation_status is None:
+                    raise RuntimeError(f"Operation for analyzer {analyzer_id} not found: {operation_location}")
+                status = operation_status.get("status")
+                if status == "Succeeded":
                     print(f"\nAnalyzer {analyzer_id} created successfully.")
                     break
-                sleep(5)  # wait before polling
+                if status == "Failed":
+                    raise RuntimeError(f"Analyzer {analyzer_id} creation failed: {operation_status}")
+                # Honor the service's Retry-After, else back off exponentially; jitter avoids lockstep polling
+                sleep(poll_delay(retry_after, backoff, POLL_MAX_INTERVAL))
+                backoff = min(POLL_MAX_INTERVAL, backoff * 2)
 
     resp.raise_for_status()
     #print_json(f"PUT analyzer {analyzer_id} ({schema_path.name})", resp)
@@ -106,13 +154,11 @@ def get_operation_status(session: requests.Session, analyzer_id: str, operation_
     resp = session.get(operation_location, timeout=TIMEOUT)
     if resp.status_code == 404:
         print(f"\nOperation not found for analyzer {analyzer_id}.")
-        return
-    json_resp = resp.json()
-    global operation_status
-    operation_status = json_resp.get("status", "unknown")
+        return None, None
+    json_resp = _json_loads(resp.content)
     resp.raise_for_status()
     #print_json(f"Operation status {analyzer_id}", resp)
-    return json_resp
+    return json_resp, resp.headers.get("Retry-After")
 
 def analyze_with_prebuilt_document_analyzer(session: requests.Session, doc_url: str):
     # Note: fixed the stray quote at the end of the URL from your snippet
@@ -149,19 +195,27 @@ def main():
     # GET /analyzers
     #list_analyzers(session)
 
+    if not CUSTOM_SCHEMA_PATH.exists():
+        print(f"\n(custom_schema.json not found at {CUSTOM_SCHEMA_PATH.resolve()}; skipping PUT)")
+        return
+    local_hash = schema_hash(CUSTOM_SCHEMA_PATH)
+
     # GET /analyzers/{analyzerId}
     analyzer = get_analyzer(session, ANALYZER_ID)
-
-    if analyzer:
-        print(f"\nAnalyzer {ANALYZER_ID} already exists; deleting and recreating...")
-        delete_analyzer(session, ANALYZER_ID)
-        
+    if analyzer and (analyzer.get("description") or "").endswith(local_hash):
+        print(f"\nAnalyzer {ANALYZER_ID} is up to date with {CUSTOM_SCHEMA_PATH.name}; nothing to do.")
+        return
 
     # PUT /analyzers/{analyzerId} with custom_schema.json
-    if CUSTOM_SCHEMA_PATH.exists():
-        put_analyzer(session, ANALYZER_ID, CUSTOM_SCHEMA_PATH)
-    else:
-        print(f"\n(custom_schema.json not found at {CUSTOM_SCHEMA_PATH.resolve()}; skipping PUT)")
+    try:
+        put_analyzer(session, ANALYZER_ID, CUSTOM_SCHEMA_PATH, local_hash)
+    except requests.HTTPError as e:
+        # The service rejects replacing an existing analyzer; fall back to delete + recreate
+        if e.response is None or e.response.status_code != 409:
+            raise
+        print(f"\nAnalyzer {ANALYZER_ID} already exists with a different schema; deleting and recreating...")
+        delete_analyzer(session, ANALYZER_ID)
+        put_analyzer(session, ANALYZER_ID, CUSTOM_SCHEMA_PATH, local_hash)
 
     # GET /analyzers/{analyzerId}/operations/{operationId}
 
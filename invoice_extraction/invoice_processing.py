@@ -1,24 +1,45 @@
+import asyncio
+import contextlib
+import hashlib
 import json
 import logging
 import sys
+import threading
 import time
 from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Any, cast
 from dataclasses import dataclass
 import os
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
+from retry_utils import poll_delay
 load_dotenv()
 
+try:
+    import orjson  # optional: much faster (de)serialization of large CU responses
+except ImportError:
+    orjson = None
+
+try:
+    import aiohttp  # optional: main() polls all files from one event loop when available
+except ImportError:
+    aiohttp = None
+
 """
 Updates:
 - Iterates over all entries in `file_urls` correctly
 - Reads subscription key / AAD token from environment if present
 - Writes TWO outputs per file:
-    1) Raw Azure response (unchanged) under invoice_processing_result/raw_*.json
+    1) Raw Azure response (unchanged) under invoice_processing_result/raw_<name>_<key>.json,
+       with a raw_*.meta.json sidecar; a later run against the same analyzer
+       version and an unchanged document reuses the raw file instead of
+       calling the service again
     2) Normalized JSON whose fields conform to custom_schema.json under
-       invoice_processing_result/normalized_*.json
+       invoice_processing_result/normalized_<name>_<key>.json
 - Robustly extracts values (string/number/date/object/array) from the Azure
   response following the shape used by Content Understanding. The normalizer
   only includes fields that are actually present in the response.
@@ -41,6 +62,21 @@ AZURE_CU_SUBSCRIPTION_KEY = os.getenv("AZURE_CONTENT_UNDERSTANDING_SUBSCRIPTION_
 AZURE_CU_AAD_TOKEN = os.getenv("AZURE_CONTENT_UNDERSTANDING_AAD_TOKEN", "")
 ANALYZER_ID = os.getenv("AZURE_CONTENT_UNDERSTANDING_ANALYZER_ID", "custom_invoice_processing_v1")
 
+# Concurrency: files are processed on a thread pool; CU_MAX_INFLIGHT caps how many
+# analyze operations are outstanding at once and CU_SUBMIT_RPS spaces out submits.
+MAX_WORKERS = 16
+CU_MAX_INFLIGHT = int(os.getenv("CU_MAX_INFLIGHT", "8"))
+CU_SUBMIT_RPS = float(os.getenv("CU_SUBMIT_RPS", "4"))
+
+# Transient HTTP statuses are retried with backoff (honoring Retry-After). The
+# analyze POST is not idempotent: a 5xx may arrive after the job was accepted, so
+# submits are only retried on statuses that mean it was not.
+MAX_RETRIES = 5
+RETRY_BACKOFF_SECONDS = 0.5
+MAX_RETRY_DELAY_SECONDS = 30
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+SUBMIT_RETRY_STATUSES = (429, 503)
+
 # ----------------------- Client ------------------------------
 @dataclass(frozen=True, kw_only=True)
 class Settings:
@@ -65,6 +101,21 @@ class Settings:
         return lambda: aad_token
 
 
+# Shared by the sync and async clients
+def _get_analyzer_url(endpoint: str, api_version: str, analyzer_id: str) -> str:
+    return f"{endpoint}/contentunderstanding/analyzers/{analyzer_id}?api-version={api_version}"
+
+
+def _get_analyze_url(endpoint: str, api_version: str, analyzer_id: str) -> str:
+    return f"{endpoint}/contentunderstanding/analyzers/{analyzer_id}:analyze?api-version={api_version}&stringEncoding=utf16"
+
+
+def _get_headers(subscription_key: str | None, api_token: str | None, x_ms_useragent: str) -> dict[str, str]:
+    headers = ( {"Ocp-Apim-Subscription-Key": subscription_key} if subscription_key else {"Authorization": f"Bearer {api_token}"} )
+    headers["x-ms-useragent"] = x_ms_useragent
+    return headers
+
+
 class AzureContentUnderstandingClient:
     def __init__(
         self,
@@ -85,81 +136,264 @@ class AzureContentUnderstandingClient:
         self._api_version: str = api_version
         self._logger: logging.Logger = logging.getLogger(__name__)
         self._logger.setLevel(logging.INFO)
-        self._headers: dict[str, str] = self._get_headers(
+        self._headers: dict[str, str] = _get_headers(
             subscription_key, token_provider and token_provider(), x_ms_useragent
         )
+        # One keep-alive session for the submit and every poll, so requests to
+        # the same host reuse a TCP+TLS connection instead of handshaking each time.
+        self._session: requests.Session = requests.Session()
+        self._session.headers.update(self._headers)
+        adapter = HTTPAdapter(
+            pool_connections=8,
+            pool_maxsize=32,
+            # GETs only; begin_analyze retries the submit itself
+            max_retries=Retry(
+                total=MAX_RETRIES,
+                backoff_factor=RETRY_BACKOFF_SECONDS,
+                status_forcelist=RETRY_STATUSES,
+                allowed_methods=frozenset(["GET"]),
+                respect_retry_after_header=True,
+            ),
+        )
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+
+    def close(self) -> None:
+        self._session.close()
+
+    def __enter__(self) -> "AzureContentUnderstandingClient":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
 
     def begin_analyze(self, analyzer_id: str, file_location: str):
+        url = _get_analyze_url(self._endpoint, self._api_version, analyzer_id)
         if Path(file_location).exists():
-            with open(file_location, "rb") as file:
-                data = file.read()
-            headers = {"Content-Type": "application/octet-stream"}
+            def submit() -> requests.Response:
+                # Pass the open file so requests streams it (and sets Content-Length
+                # from its size) instead of holding the whole document in memory.
+                with open(file_location, "rb") as file:
+                    return self._session.post(
+                        url=url,
+                        headers={"Content-Type": "application/octet-stream"},
+                        data=file,
+                    )
         elif file_location.startswith(("https://", "http://")):
-            data = {"url": file_location}
-            headers = {"Content-Type": "application/json"}
+            def submit() -> requests.Response:
+                return self._session.post(
+                    url=url,
+                    headers={"Content-Type": "application/json"},
+                    json={"url": file_location},
+                )
         else:
             raise ValueError("File location must be a valid path or URL.")
 
-        headers.update(self._headers)
-        if isinstance(data, dict):
-            response = requests.post(
-                url=self._get_analyze_url(self._endpoint, self._api_version, analyzer_id),
-                headers=headers,
-                json=data,
-            )
-        else:
-            response = requests.post(
-                url=self._get_analyze_url(self._endpoint, self._api_version, analyzer_id),
-                headers=headers,
-                data=data,
-            )
+        response = submit()
+        backoff = RETRY_BACKOFF_SECONDS
+        for _ in range(MAX_RETRIES):
+            if response.status_code not in SUBMIT_RETRY_STATUSES:
+                break
+            time.sleep(poll_delay(response.headers.get("Retry-After"), backoff, MAX_RETRY_DELAY_SECONDS))
+            backoff *= 2
+            response = submit()
 
         response.raise_for_status()
         self._logger.info(f"Analyzing file {file_location} with analyzer: {analyzer_id}")
         return response
 
+    def get_analyzer_etag(self, analyzer_id: str) -> str | None:
+        """Return a version tag for the analyzer (ETag, else lastModifiedAt), or None if it is missing."""
+        response = self._session.get(_get_analyzer_url(self._endpoint, self._api_version, analyzer_id))
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.headers.get("ETag") or _json_loads(response.content).get("lastModifiedAt")
+
     def poll_result(
         self,
         response: requests.Response,
         timeout_seconds: int = 120,
-        polling_interval_seconds: int = 2,
+        polling_interval_seconds: float = 0.5,
+        max_polling_interval_seconds: float = 30,
     ) -> dict[str, Any]:
+        """Poll the operation until it finishes.
+
+        Waits for the poll response's Retry-After when present, otherwise backs
+        off exponentially from polling_interval_seconds up to
+        max_polling_interval_seconds, with jitter.
+        """
         operation_location = response.headers.get("operation-location", "")
         if not operation_location:
             raise ValueError("Operation location not found in response headers.")
 
         start_time = time.time()
+        backoff = polling_interval_seconds
         while True:
             elapsed_time = time.time() - start_time
             if elapsed_time > timeout_seconds:
                 raise TimeoutError(f"Operation timed out after {timeout_seconds:.2f} seconds.")
 
-            poll = requests.get(operation_location, headers=self._headers)
+            poll = self._session.get(operation_location)
             poll.raise_for_status()
-            result = cast(dict[str, Any], poll.json())
+            result = cast(dict[str, Any], _json_loads(poll.content))
             status = str(result.get("status", "")).lower()
             if status == "succeeded":
                 return result
             if status == "failed":
                 raise RuntimeError(f"Request failed: {result}")
-            time.sleep(polling_interval_seconds)
 
-    def _get_analyze_url(self, endpoint: str, api_version: str, analyzer_id: str):
-        return f"{endpoint}/contentunderstanding/analyzers/{analyzer_id}:analyze?api-version={api_version}&stringEncoding=utf16"
+            delay = poll_delay(poll.headers.get("Retry-After"), backoff, max_polling_interval_seconds)
+            time.sleep(max(0.0, min(delay, timeout_seconds - (time.time() - start_time))))
+            backoff = min(max_polling_interval_seconds, backoff * 2)
+
+def _json_loads(data: bytes) -> Any:
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def _write_json(path: Path, data: Any) -> None:
+    if orjson is not None:
+        path.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+
+
+class AsyncAzureContentUnderstandingClient:
+    """asyncio variant of AzureContentUnderstandingClient built on aiohttp.
+
+    Waiting operations cost a suspended coroutine rather than a blocked thread,
+    so one event loop can poll many files. Use as an async context manager.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        api_version: str,
+        subscription_key: str | None = None,
+        token_provider: Callable[[], str] | None = None,
+        x_ms_useragent: str = "cu-sample-code",
+    ) -> None:
+        if aiohttp is None:
+            raise RuntimeError("aiohttp is required for AsyncAzureContentUnderstandingClient (pip install aiohttp)")
+        if not subscription_key and token_provider is None:
+            raise ValueError("Either subscription key or token provider must be provided")
+        if not api_version:
+            raise ValueError("API version must be provided")
+        if not endpoint:
+            raise ValueError("Endpoint must be provided")
+
+        self._endpoint: str = endpoint.rstrip("/")
+        self._api_version: str = api_version
+        self._logger: logging.Logger = logging.getLogger(__name__)
+        self._logger.setLevel(logging.INFO)
+        self._headers: dict[str, str] = _get_headers(
+            subscription_key, token_provider and token_provider(), x_ms_useragent
+        )
+        self._session: "aiohttp.ClientSession | None" = None
 
-    def _get_headers(self, subscription_key: str | None, api_token: str | None, x_ms_useragent: str) -> dict[str, str]:
-        headers = ( {"Ocp-Apim-Subscription-Key": subscription_key} if subscription_key else {"Authorization": f"Bearer {api_token}"} )
-        headers["x-ms-useragent"] = x_ms_useragent
-        return headers
+    async def __aenter__(self) -> "AsyncAzureContentUnderstandingClient":
+        # The session must be created inside the running event loop
+        self._session = aiohttp.ClientSession(
+            headers=self._headers,
+            connector=aiohttp.TCPConnector(limit=64, ttl_dns_cache=300, keepalive_timeout=60),
+        )
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self._session.close()
+
+    async def _request(
+        self, method: str, url: str, file_path: str | None = None, **kwargs: Any
+    ) -> tuple["aiohttp.ClientResponse", bytes]:
+        """Send a request and read its body, retrying transient statuses like the sync client.
+
+        POSTs are only retried on SUBMIT_RETRY_STATUSES. `file_path` is sent as the
+        body and reopened for each attempt. The last response is returned unraised.
+        """
+        statuses = SUBMIT_RETRY_STATUSES if method == "POST" else RETRY_STATUSES
+        backoff = RETRY_BACKOFF_SECONDS
+        for attempt in range(MAX_RETRIES + 1):
+            with open(file_path, "rb") if file_path else contextlib.nullcontext() as file:
+                if file is not None:
+                    kwargs["data"] = file
+                async with self._session.request(method, url, **kwargs) as response:
+                    content = await response.read()
+            if response.status not in statuses or attempt == MAX_RETRIES:
+                return response, content
+            await asyncio.sleep(poll_delay(response.headers.get("Retry-After"), backoff, MAX_RETRY_DELAY_SECONDS))
+            backoff *= 2
+
+    async def begin_analyze(self, analyzer_id: str, file_location: str) -> str:
+        """Submit the file and return the operation location to poll."""
+        url = _get_analyze_url(self._endpoint, self._api_version, analyzer_id)
+        if Path(file_location).exists():
+            response, _ = await self._request(
+                "POST", url, file_path=file_location, headers={"Content-Type": "application/octet-stream"}
+            )
+        elif file_location.startswith(("https://", "http://")):
+            response, _ = await self._request("POST", url, json={"url": file_location})
+        else:
+            raise ValueError("File location must be a valid path or URL.")
+
+        response.raise_for_status()
+        operation_location = response.headers.get("operation-location", "")
+        if not operation_location:
+            raise ValueError("Operation location not found in response headers.")
+        self._logger.info(f"Analyzing file {file_location} with analyzer: {analyzer_id}")
+        return operation_location
+
+    async def get_analyzer_etag(self, analyzer_id: str) -> str | None:
+        """Return a version tag for the analyzer (ETag, else lastModifiedAt), or None if it is missing."""
+        url = _get_analyzer_url(self._endpoint, self._api_version, analyzer_id)
+        response, content = await self._request("GET", url)
+        if response.status == 404:
+            return None
+        response.raise_for_status()
+        return response.headers.get("ETag") or _json_loads(content).get("lastModifiedAt")
+
+    async def poll_result(
+        self,
+        operation_location: str,
+        timeout_seconds: int = 120,
+        polling_interval_seconds: float = 0.5,
+        max_polling_interval_seconds: float = 30,
+    ) -> dict[str, Any]:
+        """Poll the operation until it finishes; same backoff as the sync client."""
+        start_time = time.time()
+        backoff = polling_interval_seconds
+        while True:
+            elapsed_time = time.time() - start_time
+            if elapsed_time > timeout_seconds:
+                raise TimeoutError(f"Operation timed out after {timeout_seconds:.2f} seconds.")
+
+            poll, content = await self._request("GET", operation_location)
+            poll.raise_for_status()
+            result = cast(dict[str, Any], _json_loads(content))
+            retry_after = poll.headers.get("Retry-After")
+            status = str(result.get("status", "")).lower()
+            if status == "succeeded":
+                return result
+            if status == "failed":
+                raise RuntimeError(f"Request failed: {result}")
+
+            delay = poll_delay(retry_after, backoff, max_polling_interval_seconds)
+            await asyncio.sleep(max(0.0, min(delay, timeout_seconds - (time.time() - start_time))))
+            backoff = min(max_polling_interval_seconds, backoff * 2)
 
 
 # ----------------------- Normalization -----------------------
 
+# Scalar value keys in order of preference
+_PREF_KEYS = ("valueNumber", "valueDate", "valueString", "content")
+
+
 def _best_value(field: dict[str, Any]) -> Any:
     """Return the most appropriate scalar value for a CU field."""
-    for key in ("valueNumber", "valueDate", "valueString", "content"):
-        if key in field and field[key] not in (None, ""):
-            return field[key]
+    for key in _PREF_KEYS:
+        value = field.get(key)
+        if value not in (None, ""):
+            return value
     # Currency type
     if "valueCurrency" in field and isinstance(field["valueCurrency"], dict):
         cur = field["valueCurrency"]
@@ -185,6 +419,22 @@ LINE_ITEM_FIELDS = [
     "item_description","product_code","item_date","item_quantity","unit","unit_price","amount","tax",
 ]
 
+# Common alternates found in CU generic outputs, mapped to our schema; used
+# only when the schema key itself is missing
+LINE_ITEM_ALIASES = {
+    "description": "item_description",
+    "productCode": "product_code",
+    "quantity": "item_quantity",
+    "unitPrice": "unit_price",
+    "lineTotal": "amount",
+    "date": "item_date",
+}
+
+# Lookup tables built once at import so normalization is a single pass over
+# each CU fields dict
+_FLAT_FIELDS = frozenset(CUSTOM_FIELDS)
+_LINE_ITEM_KEYS = {**LINE_ITEM_ALIASES, **{k: k for k in LINE_ITEM_FIELDS}}
+
 
 def normalize_to_custom_schema(service_result: dict[str, Any]) -> dict[str, Any]:
     """Map Azure CU response into the structure defined by custom_schema.json.
@@ -203,9 +453,8 @@ def normalize_to_custom_schema(service_result: dict[str, Any]) -> dict[str, Any]
         return out
 
     # Flat fields
-    for name in CUSTOM_FIELDS:
-        f = fields.get(name)
-        if isinstance(f, dict):
+    for name, f in fields.items():
+        if name in _FLAT_FIELDS and isinstance(f, dict):
             val = _best_value(f)
             if val is not None:
                 out[name] = val
@@ -226,29 +475,16 @@ def normalize_to_custom_schema(service_result: dict[str, Any]) -> dict[str, Any]
             if isinstance(v, dict):
                 # Some shapes: {"item_description": {valueString:...}, ...}
                 line: dict[str, Any] = {}
-                for k in LINE_ITEM_FIELDS:
-                    fv = v.get(k)
-                    if isinstance(fv, dict):
-                        val = _best_value(fv)
-                        if val is not None:
-                            line[k] = val
-                # Also accept common alternates found in CU generic outputs
-                # Map common aliases to our schema if our key missing
-                aliases = {
-                    "description": "item_description",
-                    "productCode": "product_code",
-                    "quantity": "item_quantity",
-                    "unitPrice": "unit_price",
-                    "lineTotal": "amount",
-                    "date": "item_date",
-                    "unit": "unit",
-                    "tax": "tax",
-                }
-                for src, dst in aliases.items():
-                    if dst not in line and isinstance(v.get(src), dict):
-                        val = _best_value(v[src])
-                        if val is not None:
-                            line[dst] = val
+                for src, fv in v.items():
+                    dst = _LINE_ITEM_KEYS.get(src)
+                    if dst is None or not isinstance(fv, dict):
+                        continue
+                    # Schema keys always win; an alias only fills a missing key
+                    if src != dst and dst in line:
+                        continue
+                    val = _best_value(fv)
+                    if val is not None:
+                        line[dst] = val
                 if line:
                     items_out.append(line)
     if items_out:
@@ -259,10 +495,190 @@ def normalize_to_custom_schema(service_result: dict[str, Any]) -> dict[str, Any]
 
 # ----------------------- Main -------------------------------
 
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart across threads and tasks."""
+
+    def __init__(self, rate: float) -> None:
+        self._interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Claim the next slot and return how many seconds to wait for it."""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self._interval
+        return start - now
+
+    def wait(self) -> None:
+        time.sleep(self.reserve())
+
+
+def _cache_key(file_url: str) -> str:
+    return hashlib.sha1(f"{ANALYZER_ID}|{file_url}".encode()).hexdigest()[:16]
+
+
+def _result_paths(file_url: str) -> tuple[Path, Path, Path]:
+    # The key keeps different URLs that share a basename from overwriting each other
+    name = Path(file_url)
+    key = _cache_key(file_url)
+    raw_path = Path(f"invoice_processing_result/raw_{name.stem}_{key}.json")
+    return raw_path, raw_path.with_suffix(".meta.json"), Path(f"invoice_processing_result/normalized_{name.stem}_{key}.json")
+
+
+def source_version(file_url: str) -> str | None:
+    """Identify the current content of file_url without downloading it.
+
+    Local files use their size and mtime; URLs use the document's ETag (None
+    when the server sends none or can't be reached).
+    """
+    path = Path(file_url)
+    if path.exists():
+        stat = path.stat()
+        return f"{stat.st_size}:{stat.st_mtime_ns}"
+    try:
+        # Plain requests, not the client session: the CU key must not go to the blob host
+        response = requests.head(file_url, allow_redirects=True, timeout=30)
+    except requests.RequestException:
+        return None
+    return response.headers.get("ETag") if response.ok else None
+
+
+def load_cached_result(file_url: str, analyzer_etag: str | None, source: str | None) -> dict[str, Any] | None:
+    """Return the saved raw result for file_url if it came from this analyzer
+    version and this version of the document.
+
+    The raw_*.meta.json sidecar records the analyzer/URL key, the analyzer
+    version and the source version (see source_version) that produced the raw
+    file; anything that doesn't match is a miss.
+    """
+    raw_path, meta_path, _ = _result_paths(file_url)
+    if analyzer_etag is None or not raw_path.exists() or not meta_path.exists():
+        return None
+    try:
+        meta = _json_loads(meta_path.read_bytes())
+        if (
+            meta.get("key") != _cache_key(file_url)
+            or meta.get("analyzer_etag") != analyzer_etag
+            or meta.get("etag") != source
+        ):
+            return None
+        return cast(dict[str, Any], _json_loads(raw_path.read_bytes()))
+    except ValueError:
+        return None
+
+
+def write_results(
+    file_url: str,
+    result: dict[str, Any],
+    analyzer_etag: str | None = None,
+    source: str | None = None,
+    cached: bool = False,
+) -> tuple[Path, Path]:
+    raw_path, meta_path, norm_path = _result_paths(file_url)
+    if not cached:
+        # Write raw, then the sidecar that lets the next run reuse it
+        _write_json(raw_path, result)
+        _write_json(
+            meta_path,
+            {
+                "key": _cache_key(file_url),
+                "analyzer_id": ANALYZER_ID,
+                "url": file_url,
+                "analyzer_etag": analyzer_etag,
+                "etag": source,
+                "ts": time.time(),
+            },
+        )
+
+    # Normalize
+    normalized = normalize_to_custom_schema(result)
+    _write_json(norm_path, normalized)
+
+    source = " (cached)" if cached else ""
+    print(f"Finished processing file: {file_url}\n  - Raw{source}: {raw_path}\n  - Normalized: {norm_path}")
+    return raw_path, norm_path
+
+
+def process_file(
+    client: AzureContentUnderstandingClient,
+    file_url: str,
+    inflight: threading.Semaphore,
+    limiter: RateLimiter,
+    analyzer_etag: str | None = None,
+) -> tuple[Path, Path]:
+    print(f"Processing file: {file_url}")
+    source = source_version(file_url)
+    result = load_cached_result(file_url, analyzer_etag, source)
+    if result is not None:
+        return write_results(file_url, result, analyzer_etag, source, cached=True)
+    with inflight:
+        # Start job
+        limiter.wait()
+        response = client.begin_analyze(ANALYZER_ID, file_url)
+        result = client.poll_result(response, timeout_seconds=60 * 60)
+    return write_results(file_url, result, analyzer_etag, source)
+
+
+async def process_file_async(
+    client: AsyncAzureContentUnderstandingClient,
+    file_url: str,
+    inflight: asyncio.Semaphore,
+    limiter: RateLimiter,
+    analyzer_etag: str | None = None,
+) -> tuple[Path, Path]:
+    print(f"Processing file: {file_url}")
+    # The HEAD request for a URL's ETag blocks, so keep it off the event loop
+    source = await asyncio.to_thread(source_version, file_url)
+    result = load_cached_result(file_url, analyzer_etag, source)
+    if result is not None:
+        return write_results(file_url, result, analyzer_etag, source, cached=True)
+    async with inflight:
+        # Start job
+        await asyncio.sleep(limiter.reserve())
+        operation_location = await client.begin_analyze(ANALYZER_ID, file_url)
+        result = await client.poll_result(operation_location, timeout_seconds=60 * 60)
+    return write_results(file_url, result, analyzer_etag, source)
+
+
+def run_threaded(settings: Settings) -> list[BaseException | None]:
+    """Process file_urls on a thread pool sharing one session-backed client."""
+    inflight = threading.Semaphore(CU_MAX_INFLIGHT)
+    limiter = RateLimiter(CU_SUBMIT_RPS)
+    with AzureContentUnderstandingClient(
+        settings.endpoint,
+        settings.api_version,
+        subscription_key=settings.subscription_key,
+        token_provider=settings.token_provider,
+    ) as client, ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(file_urls))) as pool:
+        analyzer_etag = client.get_analyzer_etag(ANALYZER_ID)
+        futures = [pool.submit(process_file, client, url, inflight, limiter, analyzer_etag) for url in file_urls]
+        return [fut.exception() for fut in futures]
+
+
+async def run_async(settings: Settings) -> list[BaseException | None]:
+    """Process file_urls as tasks on one event loop sharing one aiohttp session."""
+    inflight = asyncio.Semaphore(CU_MAX_INFLIGHT)
+    limiter = RateLimiter(CU_SUBMIT_RPS)
+    async with AsyncAzureContentUnderstandingClient(
+        settings.endpoint,
+        settings.api_version,
+        subscription_key=settings.subscription_key,
+        token_provider=settings.token_provider,
+    ) as client:
+        analyzer_etag = await client.get_analyzer_etag(ANALYZER_ID)
+        results = await asyncio.gather(
+            *(process_file_async(client, url, inflight, limiter, analyzer_etag) for url in file_urls),
+            return_exceptions=True,
+        )
+    return [r if isinstance(r, BaseException) else None for r in results]
+
+
 def main():
     os.makedirs("invoice_processing_result", exist_ok=True)
 
-    # Prepare client once
+    # Prepare client settings once
     settings_for_client = Settings(
         endpoint=AZURE_CU_ENDPOINT,
         api_version=AZURE_CU_API_VERSION,
@@ -271,32 +687,18 @@ def main():
         analyzer_id=ANALYZER_ID,
         file_location=file_urls[0],  # placeholder; not used by client directly
     )
-    client = AzureContentUnderstandingClient(
-        settings_for_client.endpoint,
-        settings_for_client.api_version,
-        subscription_key=settings_for_client.subscription_key,
-        token_provider=settings_for_client.token_provider,
-    )
-
-    for file_url in file_urls:
-        print(f"Processing file: {file_url}")
-        # Start job
-        response = client.begin_analyze(ANALYZER_ID, file_url)
-        result = client.poll_result(response, timeout_seconds=60 * 60, polling_interval_seconds=1)
-
-        # Write raw
-        raw_path = Path(f"invoice_processing_result/raw_{Path(file_url).name}.json")
-        with open(raw_path, "w", encoding="utf-8") as f:
-            json.dump(result, f, indent=2)
-
-        # Normalize
-        normalized = normalize_to_custom_schema(result)
-        norm_path = Path(f"invoice_processing_result/normalized_{Path(file_url).stem}.json")
-        with open(norm_path, "w", encoding="utf-8") as f:
-            json.dump(normalized, f, indent=2, ensure_ascii=False)
-
-        print(f"Finished processing file: {file_url}\n  - Raw: {raw_path}\n  - Normalized: {norm_path}")
-
+    if aiohttp is not None:
+        errors = asyncio.run(run_async(settings_for_client))
+    else:
+        errors = run_threaded(settings_for_client)
+
+    failed = 0
+    for file_url, error in zip(file_urls, errors):
+        if error is not None:
+            failed += 1
+            print(f"Failed processing file: {file_url}: {error}", file=sys.stderr)
+    if failed:
+        raise RuntimeError(f"{failed} of {len(file_urls)} files failed.")
     print("All files processed.")
 
 
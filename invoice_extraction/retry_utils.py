@@ -0,0 +1,26 @@
+"""Retry-After parsing and poll backoff shared by the invoice scripts."""
+import random
+import time
+from email.utils import parsedate_to_datetime
+
+
+def retry_after_seconds(value: str | None) -> float | None:
+    """Parse a Retry-After header (delta-seconds or HTTP-date) into seconds."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def poll_delay(retry_after: str | None, backoff: float, max_interval: float) -> float:
+    """Seconds until the next poll: the jittered backoff capped at max_interval,
+    but never less than the server's Retry-After."""
+    delay = min(max_interval, backoff * random.uniform(0.8, 1.2))
+    seconds = retry_after_seconds(retry_after)
+    return delay if seconds is None else max(seconds, delay)
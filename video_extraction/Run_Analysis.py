@@ -1,13 +1,27 @@
+import hashlib
+import json
+import shutil
 import streamlit as st
 from pathlib import Path
 from video_analysis import run_video_analysis
-from extract_keyframes import run_frame_extraction
+from extract_keyframes import read_manifest, run_frame_extraction
 
 st.set_page_config(page_title="Content Understanding — Upload", layout="wide")
 st.title("Upload & Analyze a Video")
 
 UPLOADS_DIR = Path(__file__).resolve().parent / "uploads"
 UPLOADS_DIR.mkdir(exist_ok=True)
+# run_frame_extraction writes to ./keyframes, which View Analysis Results reads
+KEYFRAMES_DIR = Path("keyframes")
+CHUNK_SIZE = 1 << 20  # 1 MiB
+
+
+def sha256_of(fileobj) -> str:
+    """Hash a binary file object in CHUNK_SIZE reads so large videos never sit in memory twice."""
+    hasher = hashlib.sha256()
+    for chunk in iter(lambda: fileobj.read(CHUNK_SIZE), b""):
+        hasher.update(chunk)
+    return hasher.hexdigest()
 
 st.write("1) Upload a video file, 2) I’ll save it locally, 3) I’ll call `run_video_analysis`.")
 
@@ -18,35 +32,57 @@ if uploaded:
     st.subheader("Preview")
     st.video(uploaded, width=300)# plays immediately
 
-    # --- Save to disk ---
-    save_path = UPLOADS_DIR / uploaded.name
-    uploaded.seek(0)  # make sure we're at the beginning
-    with open(save_path, "wb") as f:
-        f.write(uploaded.read())
-    st.success(f"Saved to: `{save_path}`")
+    # --- Hash once per upload; reruns from other widgets reuse the digest ---
+    if st.session_state.get("last_file_id") != uploaded.file_id:
+        uploaded.seek(0)  # make sure we're at the beginning
+        st.session_state["last_digest"] = sha256_of(uploaded)
+        st.session_state["last_file_id"] = uploaded.file_id
+    upload_sha = st.session_state["last_digest"]
+    result_path = UPLOADS_DIR / f"result_{upload_sha[:12]}.json"
 
-    # --- Run analysis ---
-    with st.spinner("Running video analysis…"):
-        try:
-            result = run_video_analysis(str(save_path))
-            st.success("Analysis finished.")
-            if isinstance(result, (dict, list)):
-                st.json(result)
-            elif result is not None:
-                st.write(result)
-        except Exception as e:
-            st.error(f"Analysis failed: {e}")
+    # keyframes/ is shared by every upload, so only skip when its manifest says the
+    # frames and phrase map there came from this exact content
+    if result_path.exists() and read_manifest(KEYFRAMES_DIR).get("source_digest") == upload_sha:
+        st.success("This video was already analyzed; showing the saved result.")
+        st.json(json.loads(result_path.read_bytes()))
+    else:
+        # --- Save to disk ---
+        save_path = UPLOADS_DIR / uploaded.name
+        unchanged = False
+        if save_path.exists() and save_path.stat().st_size == uploaded.size:
+            with open(save_path, "rb") as f:
+                unchanged = sha256_of(f) == upload_sha
+        if unchanged:
+            st.success(f"Identical file already saved at: `{save_path}`")
+        else:
+            uploaded.seek(0)
+            with open(save_path, "wb") as f:
+                shutil.copyfileobj(uploaded, f, length=CHUNK_SIZE)
+            st.success(f"Saved to: `{save_path}`")
+
+        # --- Run analysis ---
+        with st.spinner("Running video analysis…"):
+            try:
+                result = run_video_analysis(str(save_path))
+                st.success("Analysis finished.")
+                if isinstance(result, (dict, list)):
+                    st.json(result)
+                    result_path.write_text(json.dumps(result), encoding="utf-8")
+                elif result is not None:
+                    st.write(result)
+            except Exception as e:
+                st.error(f"Analysis failed: {e}")
 
-    # --- Extract keyframes ---
-    st.write("Extracting keyframes from the video...")
-    try:
-        # Prefer passing full path; fall back to fileName if your function uses that.
+        # --- Extract keyframes ---
+        st.write("Extracting keyframes from the video...")
         try:
-            run_frame_extraction(file_path=uploaded.name)
-        except TypeError:
-            run_frame_extraction(fileName=uploaded.name)
-        st.success("Keyframe extraction finished.")
-    except Exception as e:
-        st.error(f"Keyframe extraction failed: {e}")
+            # Prefer passing full path; fall back to fileName if your function uses that.
+            try:
+                run_frame_extraction(file_path=uploaded.name, source_digest=upload_sha)
+            except TypeError:
+                run_frame_extraction(fileName=uploaded.name, source_digest=upload_sha)
+            st.success("Keyframe extraction finished.")
+        except Exception as e:
+            st.error(f"Keyframe extraction failed: {e}")
 
     st.info("Open **View Analysis Results** in the sidebar to view results.")
@@ -15,14 +15,27 @@ Outputs:
 - Extracted images in --outdir named like: <prefix>.<ms>.<ext>
 - keyframes_index.csv (all keyframes, regardless of --only_matched)
 - phrase_keyframe_map.csv (when --match_phrases is enabled)
+- keyframes_manifest.json (source video and image settings of the last
+  completed run; frames are only reused when they match)
 
 Implementation detail:
-- Frames are read with OpenCV (cv2) using CAP_PROP_POS_MSEC seeking.
+- Frames are read with OpenCV (cv2) in one sequential grab()/retrieve() pass;
+  targets far ahead of the read position are reached with a frame seek.
+- With --backend av, PyAV seeks to the keyframe preceding each target and
+  decodes forward to it (requires: pip install av).
+- With --backend ffmpeg, all frames are produced by a single ffmpeg decode pass
+  using a select filter (requires ffmpeg/ffprobe on PATH).
 """
 import argparse
+import csv
+import functools
 import json
 import os
+import shutil
+import subprocess
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from fractions import Fraction
 from pathlib import Path
 from typing import List, Dict, Any
 
@@ -38,27 +51,96 @@ except Exception as e:
     )
     raise
 
+import numpy as np  # installed with opencv-python
+import pandas as pd  # installed with streamlit
+
+try:
+    import orjson  # optional: faster parsing of large metadata JSON
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+try:
+    import av  # optional: only needed for --backend av
+except ImportError:
+    av = None
+
+# PyAV reports the container's display rotation (counter-clockwise degrees) but,
+# unlike OpenCV, does not apply it to decoded frames.
+AV_ROTATIONS = {
+    90: cv2.ROTATE_90_COUNTERCLOCKWISE,
+    -90: cv2.ROTATE_90_CLOCKWISE,
+    180: cv2.ROTATE_180,
+    -180: cv2.ROTATE_180,
+}
+
+# Maximum number of frame indices per ffmpeg select filter; longer lists are
+# split into several invocations so the filter string stays manageable.
+FFMPEG_SELECT_CHUNK = 500
+
+# Targets at most this many frames ahead are reached with grab() (no decode);
+# farther ones use a CAP_PROP_POS_FRAMES seek, which beats grabbing a long run.
+MAX_GRAB_GAP_FRAMES = 300
+
+# Written next to keyframes_index.csv after a completed extraction
+KEYFRAMES_MANIFEST = "keyframes_manifest.json"
+
 def eprint(*args, **kwargs):
     print(*args, file=sys.stderr, **kwargs)
 
+@functools.lru_cache(maxsize=8192)
 def ms_to_timecode(ms: int) -> str:
     s, ms_part = divmod(ms, 1000)
     m, s = divmod(s, 60)
     h, m = divmod(m, 60)
-    return f"{h:02d}:{m:02d}:{s:02d}.{ms_part:03d}"
+    return "%02d:%02d:%02d.%03d" % (h, m, s, ms_part)
+
+def ms_to_timecode_vec(ms_values) -> List[str]:
+    """Vectorized ms_to_timecode for a sequence of millisecond values."""
+    ms = np.asarray(ms_values, dtype=np.int64)
+    if ms.size == 0:
+        return []
+    s, ms_part = np.divmod(ms, 1000)
+    m, s = np.divmod(s, 60)
+    h, m = np.divmod(m, 60)
+
+    def pad(a, width):
+        return np.char.zfill(a.astype(str), width)
+
+    tc = pad(h, 2)
+    for sep, part, width in ((":", m, 2), (":", s, 2), (".", ms_part, 3)):
+        tc = np.char.add(np.char.add(tc, sep), pad(part, width))
+    return tc.tolist()
+
+def write_parquet_copy(df: pd.DataFrame, path: Path):
+    """
+    Write a Parquet copy of a CSV output; the viewer loads it without type
+    inference. Skipped when no Parquet engine (pyarrow) is installed.
+    """
+    try:
+        df.to_parquet(path, index=False)
+    except ImportError:
+        eprint(f"Skipping {path.name}: install pyarrow to also write a Parquet copy.")
+
+def read_manifest(outdir: Path) -> Dict[str, Any]:
+    """Return the manifest of the last completed extraction into `outdir`, or {}."""
+    try:
+        return _json_loads((outdir / KEYFRAMES_MANIFEST).read_bytes())
+    except (OSError, ValueError):
+        return {}
 
 def read_json(json_arg: str | None) -> Dict[str, Any]:
     if json_arg:
         p = Path(json_arg)
         if p.exists():
-            return json.loads(p.read_text(encoding="utf-8"))
+            return _json_loads(p.read_bytes())
         else:
-            return json.loads(json_arg)
+            return _json_loads(str(json_arg))
     else:
-        data = sys.stdin.read()
+        data = sys.stdin.buffer.read()
         if not data.strip():
             raise SystemExit("No JSON provided via --json or stdin.")
-        return json.loads(data)
+        return _json_loads(data)
 
 def extract_keyframe_times(blob: Dict[str, Any]) -> List[int]:
     try:
@@ -71,24 +153,19 @@ def extract_keyframe_times(blob: Dict[str, Any]) -> List[int]:
     except Exception:
         pass
 
-    # Fallback search
-    def walk(obj):
+    # Fallback search: iterative depth-first scan that stops at the first valid
+    # KeyFrameTimesMs list. Each dict's own KeyFrameTimesMs is checked before any
+    # of its values are descended into; values and list items are walked in order.
+    stack = [blob]
+    while stack:
+        obj = stack.pop()
         if isinstance(obj, dict):
-            for k, v in obj.items():
-                if k == "KeyFrameTimesMs" and isinstance(v, list) and all(isinstance(t, int) for t in v):
-                    return v
-                got = walk(v)
-                if got is not None:
-                    return got
+            times = obj.get("KeyFrameTimesMs")
+            if isinstance(times, list) and all(isinstance(t, int) for t in times):
+                return times
+            stack.extend(reversed(obj.values()))
         elif isinstance(obj, list):
-            for v in obj:
-                got = walk(v)
-                if got is not None:
-                    return got
-        return None
-    found = walk(blob)
-    if found is not None:
-        return found
+            stack.extend(reversed(obj))
     raise ValueError("Could not find 'KeyFrameTimesMs' in JSON.")
 
 def extract_phrase_segments(blob: Dict[str, Any]) -> List[Dict[str, Any]]:
@@ -99,47 +176,51 @@ def extract_phrase_segments(blob: Dict[str, Any]) -> List[Dict[str, Any]]:
     if not contents:
         return []
     item = contents[0]
-    phrases = item.get("transcriptPhrases", [])
-    segments = []
-    for p in phrases:
-        words = p.get("words", [])
-        if not words:
-            continue
-        cur_words = []
-        seg_start = None
-        for w in words:
-            wtext = (w.get("text") or "").strip()
-            ws = int(w.get("startTimeMs"))
-            we = int(w.get("endTimeMs"))
-            if seg_start is None:
-                seg_start = ws
-            cur_words.append(wtext.rstrip())
-            # If a word ends with a comma or period, we close the segment
-            if wtext.endswith(",") or wtext.endswith("."):
-                joined = " ".join(cur_words).strip()
-                joined = joined.replace(" ,", ",").replace(" .", ".")
-                human = joined.rstrip(",.").strip()
-                segments.append({
-                    "text": human,
-                    "startTimeMs": seg_start,
-                    "endTimeMs": we,
-                })
-                cur_words = []
-                seg_start = None
-        # Flush any trailing words without punctuation
-        if cur_words:
-            joined = " ".join(cur_words).strip()
-            human = joined.rstrip(",.").strip()
-            end_ms = words[-1].get("endTimeMs")
-            segments.append({
-                "text": human,
-                "startTimeMs": seg_start if seg_start is not None else int(words[0].get("startTimeMs", 0)),
-                "endTimeMs": int(end_ms) if end_ms is not None else int(words[-1]["endTimeMs"]),
-            })
-    return segments
-
-def nearest_keyframe(target_ms: int, keyframes: List[int]) -> int:
-    return min(keyframes, key=lambda k: abs(k - target_ms))
+    phrases = [p.get("words") or [] for p in item.get("transcriptPhrases", [])]
+    words = pd.json_normalize([w for ws in phrases for w in ws])
+    if words.empty:
+        return []
+
+    text = words["text"].fillna("").astype(str).str.strip() if "text" in words else pd.Series("", index=words.index)
+    # A word ending with a comma or period closes its segment; segments never
+    # span transcript phrases, so a new phrase also starts a new segment.
+    closes = text.str.endswith((",", "."))
+    phrase_id = pd.Series(np.repeat(np.arange(len(phrases)), [len(ws) for ws in phrases]), index=words.index)
+    opens = closes.shift(fill_value=False) | phrase_id.ne(phrase_id.shift())
+    segs = pd.DataFrame({
+        "text": text,
+        "start": words["startTimeMs"].astype("int64"),
+        "end": words["endTimeMs"].astype("int64"),
+        "closed": closes,
+    }).groupby(opens.cumsum(), sort=False).agg(
+        text=("text", " ".join),
+        startTimeMs=("start", "first"),
+        endTimeMs=("end", "last"),
+        closed=("closed", "last"),
+    )
+
+    joined = segs["text"].str.strip()
+    # Only punctuation-closed segments get " ," / " ." collapsed; trailing
+    # unpunctuated words are flushed as-is.
+    tidied = joined.str.replace(" ,", ",", regex=False).str.replace(" .", ".", regex=False)
+    human = joined.where(~segs["closed"], tidied).str.rstrip(",.").str.strip()
+    return [
+        {"text": t, "startTimeMs": st, "endTimeMs": en}
+        for t, st, en in zip(human.tolist(), segs["startTimeMs"].tolist(), segs["endTimeMs"].tolist())
+    ]
+
+def nearest_keyframes(anchors_ms, keyframes: List[int]) -> np.ndarray:
+    """Return, for each anchor, the closest keyframe (ties go to the earlier one).
+    `keyframes` must be sorted ascending; the whole batch is one searchsorted.
+    """
+    kf = np.asarray(keyframes, dtype=np.int64)
+    anchors = np.asarray(anchors_ms, dtype=np.int64)
+    if kf.size == 0 and anchors.size:
+        raise ValueError("No keyframes to match phrases against.")
+    idx = np.searchsorted(kf, anchors)
+    left = kf[np.clip(idx - 1, 0, len(kf) - 1)]
+    right = kf[np.clip(idx, 0, len(kf) - 1)]
+    return np.where((anchors - left) > (right - anchors), right, left)
 
 # --- Helpers for image saving with OpenCV ---
 
@@ -154,17 +235,24 @@ def map_ffmpeg_q_to_jpeg_quality(q: int) -> int:
     # quality = 100 + (q-1)*(-3)
     return max(0, min(100, 100 - 3 * (q - 1)))
 
-def save_image(out_path: Path, frame, fmt: str, jpeg_q: int):
-    params = []
+def imwrite_params(fmt: str, quality_q: int) -> List[int]:
+    """
+    Build the cv2.imwrite params for a run once; the quality is constant
+    across frames so there is no need to recompute it per image.
+    """
+    jpeg_q = map_ffmpeg_q_to_jpeg_quality(quality_q)
     ext = fmt.lower()
     if ext in ("jpg", "jpeg"):
-        params = [cv2.IMWRITE_JPEG_QUALITY, jpeg_q]
-    elif ext == "png":
+        return [cv2.IMWRITE_JPEG_QUALITY, jpeg_q]
+    if ext == "png":
         # PNG compression 0 (none) .. 9 (max). Map JPEG quality inversely.
         # Use a gentle inverse mapping: high quality -> low compression.
         # e.g., jpeg_q 100 -> 1, 70 -> 3, 40 -> 6, <=10 -> 9
         comp = int(round(max(0, min(9, (100 - jpeg_q) * 0.09 + 1))))
-        params = [cv2.IMWRITE_PNG_COMPRESSION, comp]
+        return [cv2.IMWRITE_PNG_COMPRESSION, comp]
+    return []
+
+def save_image(out_path: Path, frame, params: List[int]):
     ok = cv2.imwrite(str(out_path), frame, params)
     if not ok:
         raise RuntimeError(f"Failed to write image: {out_path}")
@@ -194,30 +282,279 @@ def resize_keep_aspect(frame, target_w: int | None):
         return frame
     scale = target_w / float(w)
     target_h = max(1, int(round(h * scale)))
-    return cv2.resize(frame, (target_w, target_h), interpolation=cv2.INTER_CUBIC)
+    # INTER_AREA is both faster and alias-free when shrinking; cubic for enlarging.
+    interpolation = cv2.INTER_AREA if target_w < w else cv2.INTER_CUBIC
+    return cv2.resize(frame, (target_w, target_h), interpolation=interpolation)
+
+def open_capture(video: Path, hwaccel: bool = False) -> cv2.VideoCapture:
+    """Open `video` with the FFmpeg backend, falling back to OpenCV's default.
+    With hwaccel, ask for any available hardware decoder (NVDEC/VAAPI/D3D11/...);
+    OpenCV silently decodes in software when none is usable.
+    """
+    params = [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY] if hwaccel else []
+    cap = cv2.VideoCapture(str(video), cv2.CAP_FFMPEG, params)
+    if not cap.isOpened():
+        cap = cv2.VideoCapture(str(video))
+    if not cap.isOpened():
+        raise RuntimeError(f"Could not open video: {video}")
+    return cap
+
+def extract_and_write_frame(cap: cv2.VideoCapture, timestamp_ms: int, out_path: Path, write_params: List[int], scale_width: int | None):
+    """Seek an already-open capture to timestamp_ms and write that frame."""
+    frame = get_frame_at_ms(cap, timestamp_ms)
+    if frame is None:
+        raise RuntimeError(f"Failed to read frame near {timestamp_ms} ms (timecode {ms_to_timecode(timestamp_ms)})")
+
+    # OpenCV reads in BGR; for JPEG/PNG via cv2.imwrite this is fine.
+    frame = resize_keep_aspect(frame, scale_width)
+    save_image(out_path, frame, write_params)
 
-def extract_and_write_frame(video: Path, timestamp_ms: int, out_path: Path, quality_q: int, scale_width: int | None, fmt: str, dry_run: bool = False):
+def extract_many_frames(video: Path, timestamps_ms: List[int], outdir: Path, prefix: str, write_params: List[int], scale_width: int | None, fmt: str, dry_run: bool = False, hwaccel: bool = False):
+    """
+    Extract many timestamps with a single capture, opened once per call.
+    Target frame indices are walked in ascending order: frames in between are
+    skipped with grab() and only the targets are decoded via retrieve().
+    """
     if dry_run:
-        print(f"# DRY RUN: extract frame @ {timestamp_ms} ms -> {out_path}")
+        for t in timestamps_ms:
+            print(f"# DRY RUN: extract frame @ {t} ms -> {outdir / f'{prefix}.{t}.{fmt}'}")
         return
 
-    cap = cv2.VideoCapture(str(video))
-    if not cap.isOpened():
-        raise RuntimeError(f"Could not open video: {video}")
+    cap = open_capture(video, hwaccel)
 
     try:
-        frame = get_frame_at_ms(cap, timestamp_ms)
-        if frame is None:
-            raise RuntimeError(f"Failed to read frame near {timestamp_ms} ms (timecode {ms_to_timecode(timestamp_ms)})")
-
-        # OpenCV reads in BGR; for JPEG/PNG via cv2.imwrite this is fine.
-        frame = resize_keep_aspect(frame, scale_width)
-        jpeg_q = map_ffmpeg_q_to_jpeg_quality(quality_q)
-        save_image(out_path, frame, fmt, jpeg_q)
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        if fps <= 0:
+            # No frame rate to map ms -> index; fall back to time-based seeks.
+            for t in sorted(timestamps_ms):
+                extract_and_write_frame(cap, t, outdir / f"{prefix}.{t}.{fmt}", write_params, scale_width)
+            return
+
+        targets = sorted((int(round(t * fps / 1000.0)), t) for t in timestamps_ms)
+        pos = 0  # index of the frame the next grab() returns
+        frame, frame_idx = None, -1
+        for idx, t in targets:
+            if idx != frame_idx:
+                if idx - pos > MAX_GRAB_GAP_FRAMES:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
+                    pos = idx
+                ok = True
+                while ok and pos <= idx:
+                    ok = cap.grab()
+                    pos += 1
+                frame = cap.retrieve()[1] if ok else None
+                frame_idx = idx
+            if frame is None:
+                raise RuntimeError(f"Failed to read frame near {t} ms (timecode {ms_to_timecode(t)})")
+
+            # OpenCV reads in BGR; for JPEG/PNG via cv2.imwrite this is fine.
+            save_image(outdir / f"{prefix}.{t}.{fmt}", resize_keep_aspect(frame, scale_width), write_params)
     finally:
         cap.release()
 
-def run_frame_extraction(fileName: str):
+def run_av_extract(video: Path, timestamps_ms: List[int], outdir: Path, prefix: str, write_params: List[int], scale_width: int | None, fmt: str, dry_run: bool = False, keyframes_only: bool = False):
+    """
+    Extract timestamps with PyAV using keyframe-accurate seeks.
+    For each target (ascending) seek back to the preceding keyframe and decode
+    forward to the frames either side of the target time, writing the nearer
+    one. With keyframes_only the decoder skips non-key frames, so the nearest
+    keyframe is written.
+    """
+    if av is None:
+        raise SystemExit("PyAV is required for --backend av. Install with: pip install av")
+    if dry_run:
+        for t in timestamps_ms:
+            print(f"# DRY RUN: extract frame @ {t} ms -> {outdir / f'{prefix}.{t}.{fmt}'}")
+        return
+
+    with av.open(str(video)) as container:
+        stream = container.streams.video[0]
+        if keyframes_only:
+            stream.codec_context.skip_frame = "NONKEY"
+        time_base = stream.time_base
+        # pts are absolute; timestamps are relative to the stream's first frame
+        start = (stream.start_time or 0) * time_base
+        for t in sorted(timestamps_ms):
+            target = start + Fraction(t, 1000)
+            container.seek(int(target / time_base), stream=stream, backward=True, any_frame=False)
+            frame = prev = None
+            for frame in container.decode(stream):
+                if frame.pts is None:
+                    continue
+                if frame.pts * time_base >= target:
+                    # CU timestamps are rounded to whole ms, so the frame just before may be the one meant
+                    if prev is not None and target - prev.pts * time_base < frame.pts * time_base - target:
+                        frame = prev
+                    break
+                prev = frame
+            if frame is None:
+                raise RuntimeError(f"Failed to read frame near {t} ms (timecode {ms_to_timecode(t)})")
+            image = frame.to_ndarray(format="bgr24")
+            rotation = AV_ROTATIONS.get(int(getattr(frame, "rotation", 0) or 0))
+            if rotation is not None:
+                image = cv2.rotate(image, rotation)
+            image = resize_keep_aspect(image, scale_width)
+            save_image(outdir / f"{prefix}.{t}.{fmt}", image, write_params)
+
+def extract_in_parallel(extract_fn, video: Path, timestamps_ms: List[int], jobs: int, *args, **kwargs):
+    """
+    Split the sorted timestamps into `jobs` contiguous runs and extract each run
+    on its own thread with its own decoder. OpenCV and PyAV release the GIL while
+    decoding, so threads scale with cores; each run starts with one forward seek.
+    """
+    ordered = sorted(timestamps_ms)
+    if jobs <= 1 or len(ordered) <= 1:
+        return extract_fn(video, ordered, *args, **kwargs)
+    size = -(-len(ordered) // jobs)
+    runs = [ordered[i:i + size] for i in range(0, len(ordered), size)]
+    with ThreadPoolExecutor(max_workers=len(runs)) as pool:
+        futures = [pool.submit(extract_fn, video, run, *args, **kwargs) for run in runs]
+        for fut in futures:
+            fut.result()
+
+def probe_fps(video: Path) -> float:
+    """Return the average frame rate of the first video stream using ffprobe."""
+    out = subprocess.run(
+        [
+            "ffprobe", "-v", "error", "-select_streams", "v:0",
+            "-show_entries", "stream=avg_frame_rate",
+            "-of", "default=noprint_wrappers=1:nokey=1", str(video),
+        ],
+        capture_output=True, text=True, check=True,
+    ).stdout.strip()
+    num, _, den = out.partition("/")
+    try:
+        fps = float(num) / float(den or 1)
+    except (ValueError, ZeroDivisionError):
+        fps = 0.0
+    if fps <= 0:
+        raise RuntimeError(f"Could not determine frame rate of {video} (ffprobe returned {out!r})")
+    return fps
+
+def probe_frame_times(video: Path) -> List[float]:
+    """
+    Return the presentation time (s) of every frame of the first video stream,
+    in display order. ffprobe only demuxes packets here, nothing is decoded.
+    """
+    out = subprocess.run(
+        [
+            "ffprobe", "-v", "error", "-select_streams", "v:0",
+            "-show_entries", "packet=pts_time", "-of", "csv=p=0", str(video),
+        ],
+        capture_output=True, text=True, check=True,
+    ).stdout
+    return sorted(float(v) for v in out.split() if v != "N/A")
+
+def run_ffmpeg_keyframes_extract(video: Path, timestamps_ms: List[int], outdir: Path, prefix: str, fmt: str, quality_q: int, scale_width: int | None, dry_run: bool = False, hwaccel: bool = False):
+    """
+    Decode only the video's key frames (-skip_frame nokey) in one ffmpeg pass,
+    then write the nearest decoded keyframe for each requested timestamp.
+    Outputs are named by their pts in ms (-enc_time_base 1:1000 -frame_pts 1).
+    """
+    if shutil.which("ffmpeg") is None:
+        raise SystemExit("ffmpeg must be on PATH to use --backend ffmpeg.")
+
+    tmp_prefix = f".{prefix}.keyframe"
+    cmd = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y"]
+    if hwaccel:
+        cmd += ["-hwaccel", "auto"]
+    cmd += ["-skip_frame", "nokey", "-discard", "nokey", "-i", str(video)]
+    if scale_width:
+        cmd += ["-vf", f"scale={scale_width}:-2"]
+    cmd += ["-vsync", "vfr", "-enc_time_base", "1:1000", "-frame_pts", "1"]
+    if fmt == "jpg":
+        cmd += ["-q:v", str(quality_q)]
+    cmd.append(str(outdir / f"{tmp_prefix}.%d.{fmt}"))
+
+    if dry_run:
+        print(f"# DRY RUN: key frames only for {len(timestamps_ms)} timestamps -> {outdir}")
+        print(" ".join(cmd))
+        return
+
+    # Leftovers from an aborted run (possibly of another video) would otherwise be taken as its key frames
+    for stale in outdir.glob(f"{tmp_prefix}.*.{fmt}"):
+        stale.unlink()
+    subprocess.run(cmd, check=True)
+    decoded = {int(p.name[len(tmp_prefix) + 1:-len(fmt) - 1]): p for p in outdir.glob(f"{tmp_prefix}.*.{fmt}")}
+    try:
+        if not decoded:
+            raise RuntimeError(f"ffmpeg decoded no key frames from {video}")
+        decoded_ms = sorted(decoded)
+        for t, k in zip(timestamps_ms, nearest_keyframes(timestamps_ms, decoded_ms).tolist()):
+            shutil.copyfile(decoded[k], outdir / f"{prefix}.{t}.{fmt}")
+    finally:
+        for p in decoded.values():
+            p.unlink()
+
+def run_ffmpeg_extract(video: Path, timestamps_ms: List[int], outdir: Path, prefix: str, fmt: str, quality_q: int, scale_width: int | None, dry_run: bool = False, hwaccel: bool = False):
+    """
+    Extract every requested timestamp with one ffmpeg decode pass.
+    Timestamps are converted to frame indices with the probed fps and picked with
+    select='eq(n,i)+...'. ffmpeg numbers its outputs sequentially, so each output
+    is renamed to <prefix>.<ms>.<ext> in ascending frame-index order. Each chunk
+    of FFMPEG_SELECT_CHUNK indices seeks to its first frame before decoding.
+    """
+    if shutil.which("ffmpeg") is None or shutil.which("ffprobe") is None:
+        raise SystemExit("ffmpeg and ffprobe must be on PATH to use --backend ffmpeg.")
+
+    fps = probe_fps(video)
+    # Several timestamps can round to the same frame; decode it once and copy.
+    by_index: Dict[int, List[int]] = {}
+    for t in timestamps_ms:
+        by_index.setdefault(int(round(t * fps / 1000.0)), []).append(t)
+    indices = sorted(by_index)
+
+    # Frame timestamps let each chunk seek straight to its first frame; the probed
+    # fps alone drifts from the real timestamps when the video has gaps.
+    frame_times = probe_frame_times(video) if indices and indices[0] > 0 else []
+    tmp_prefix = f".{prefix}.ffmpeg"
+    for start in range(0, len(indices), FFMPEG_SELECT_CHUNK):
+        chunk = indices[start:start + FFMPEG_SELECT_CHUNK]
+        # Seeking to midway between the chunk's first frame and the one before it makes
+        # that frame n=0 of the output, so select on offsets from it.
+        first = chunk[0] if 0 < chunk[0] < len(frame_times) else 0
+        vf = "select='" + "+".join(f"eq(n\\,{i - first})" for i in chunk) + "'"
+        if scale_width:
+            vf += f",scale={scale_width}:-2"
+        cmd = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y"]
+        if hwaccel:
+            # Decoded frames are downloaded to system memory for select/scale/encode.
+            cmd += ["-hwaccel", "auto"]
+        if first:
+            seek = (frame_times[first - 1] + frame_times[first]) / 2
+            # -seek_timestamp: the probed times are absolute, not relative to the start time
+            cmd += ["-seek_timestamp", "1", "-ss", f"{seek:.6f}"]
+        cmd += [
+            "-i", str(video),
+            "-vf", vf,
+            "-vsync", "vfr",
+        ]
+        if fmt == "jpg":
+            cmd += ["-q:v", str(quality_q)]
+        cmd.append(str(outdir / f"{tmp_prefix}.%d.{fmt}"))
+
+        if dry_run:
+            print(f"# DRY RUN: {len(chunk)} frames @ {fps:.3f} fps -> {outdir}")
+            print(" ".join(cmd))
+            continue
+
+        # Leftovers from an aborted run would otherwise be renamed as this chunk's frames
+        for stale in outdir.glob(f"{tmp_prefix}.*.{fmt}"):
+            stale.unlink()
+        subprocess.run(cmd, check=True)
+        for seq, idx in enumerate(chunk, start=1):
+            tmp = outdir / f"{tmp_prefix}.{seq}.{fmt}"
+            targets = by_index[idx]
+            if not tmp.exists():
+                raise RuntimeError(f"ffmpeg produced no frame for index {idx} (timecode {ms_to_timecode(targets[0])})")
+            for t in targets[1:]:
+                shutil.copyfile(tmp, outdir / f"{prefix}.{t}.{fmt}")
+            tmp.replace(outdir / f"{prefix}.{targets[0]}.{fmt}")
+
+def run_frame_extraction(fileName: str, source_digest: str | None = None):
+    """Run the CLI for `fileName`. `source_digest` (e.g. a hash of the uploaded
+    file) is recorded in the manifest so callers can tell which upload the
+    frames in outdir belong to."""
     print(f"Extracting keyframes from video: {fileName}")
     ap = argparse.ArgumentParser(description="Extract images from a video at keyframe timestamps provided in JSON metadata and match transcript phrase segments to keyframes.")
     ap.add_argument("--video", help="Path to the video file", default=fileName)
@@ -227,6 +564,11 @@ def run_frame_extraction(fileName: str):
     ap.add_argument("--format", default="jpg", choices=["jpg", "jpeg", "png"], help="Image format (default: jpg)")
     ap.add_argument("--quality", type=int, default=2, help="JPG quality compatible with ffmpeg -q:v semantics (1=best, 31=worst) (default: 2)")
     ap.add_argument("--scale_width", type=int, default=None, help="Optional output width; keeps aspect ratio")
+    ap.add_argument("--backend", default="opencv", choices=["opencv", "av", "ffmpeg"], help="Frame decoder: sequential OpenCV pass, PyAV keyframe seeks, or a single ffmpeg pass (default: opencv)")
+    ap.add_argument("--hwaccel", action="store_true", help="Use hardware video decoding when available (opencv/ffmpeg backends)")
+    ap.add_argument("--keyframes_only", action="store_true", help="Decode only codec key frames and save the nearest one per timestamp (av/ffmpeg backends; faster, may differ from the exact timestamp)")
+    ap.add_argument("--jobs", type=int, default=1, help="Parallel decoder threads for the opencv/av backends (default: 1)")
+    ap.add_argument("--force", action="store_true", help="Re-extract frames even if the manifest shows they came from this video with the same settings")
     ap.add_argument("--dry_run", action="store_true", help="Show operations without writing images")
     ap.add_argument("--timestamps_only", action="store_true", help="Print keyframe timestamps and exit")
     ap.add_argument("--match_phrases", action="store_true", help="Create a phrase->keyframe mapping using transcript segments", default=True)
@@ -238,7 +580,8 @@ def run_frame_extraction(fileName: str):
         raise SystemExit(f"Video not found: {video}")
 
     blob = read_json(VIDEO_ANALYSIS_DIR / args.json)
-    keyframes = extract_keyframe_times(blob)
+    # Sorted and unique: every seek is forward-only and the index CSV is ordered
+    keyframes = sorted(set(extract_keyframe_times(blob)))
 
     if args.timestamps_only:
         for t in keyframes:
@@ -252,33 +595,33 @@ def run_frame_extraction(fileName: str):
 
     # Always write an index of all keyframes we know about
     csv_index = outdir / "keyframes_index.csv"
-    with csv_index.open("w", encoding="utf-8") as f:
-        f.write("timestamp_ms,timecode,filename\n")
-        for t in keyframes:
-            f.write(f"{t},{ms_to_timecode(t)},{args.prefix}.{t}.{fmt}\n")
+    lines = ["timestamp_ms,timecode,filename"]
+    lines += [f"{t},{tc},{args.prefix}.{t}.{fmt}" for t, tc in zip(keyframes, ms_to_timecode_vec(keyframes))]
+    csv_index.write_text("\n".join(lines) + "\n", encoding="utf-8")
 
     matched_set = set()
     if args.match_phrases:
         segments = extract_phrase_segments(blob)
         map_csv = outdir / "phrase_keyframe_map.csv"
-        with map_csv.open("w", encoding="utf-8") as f:
-            f.write("phrase_idx,phrase_text,start_ms,start_tc,end_ms,end_tc,anchor_ms,anchor_tc,matched_keyframe_ms,matched_keyframe_tc,matched_filename\n")
-            for idx, seg in enumerate(segments, start=1):
-                start_ms = int(seg["startTimeMs"])
-                end_ms = int(seg["endTimeMs"])
-                anchor = (start_ms + end_ms) // 2
-                matched = nearest_keyframe(anchor, keyframes)
-                matched_set.add(matched)
-                phrase_text = seg["text"].replace('"', "'")
-                line = (
-                    f'{idx},"{phrase_text}",'
-                    f"{start_ms},{ms_to_timecode(start_ms)},"
-                    f"{end_ms},{ms_to_timecode(end_ms)},"
-                    f"{anchor},{ms_to_timecode(anchor)},"
-                    f"{matched},{ms_to_timecode(matched)},"
-                    f"{args.prefix}.{matched}.{fmt}\n"
-                )
-                f.write(line)
+        starts = np.array([int(seg["startTimeMs"]) for seg in segments], dtype=np.int64)
+        ends = np.array([int(seg["endTimeMs"]) for seg in segments], dtype=np.int64)
+        anchors = (starts + ends) // 2
+        matched = nearest_keyframes(anchors, keyframes)
+        matched_set.update(matched.tolist())
+        columns = {
+            "phrase_idx": list(range(1, len(segments) + 1)),
+            "phrase_text": [seg["text"] for seg in segments],
+            "start_ms": starts.tolist(), "start_tc": ms_to_timecode_vec(starts),
+            "end_ms": ends.tolist(), "end_tc": ms_to_timecode_vec(ends),
+            "anchor_ms": anchors.tolist(), "anchor_tc": ms_to_timecode_vec(anchors),
+            "matched_keyframe_ms": matched.tolist(), "matched_keyframe_tc": ms_to_timecode_vec(matched),
+            "matched_filename": [f"{args.prefix}.{m}.{fmt}" for m in matched.tolist()],
+        }
+        with map_csv.open("w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f, quoting=csv.QUOTE_MINIMAL, lineterminator="\n")
+            writer.writerow(columns)
+            writer.writerows(zip(*columns.values()))
+        write_parquet_copy(pd.DataFrame(columns), map_csv.with_suffix(".parquet"))
         print(f"Wrote phrase->keyframe map: {map_csv}")
 
     # Decide which frames to actually extract
@@ -287,12 +630,50 @@ def run_frame_extraction(fileName: str):
     else:
         to_extract = keyframes
 
-    # Extract frames
-    for t in to_extract:
-        out_path = outdir / f"{args.prefix}.{t}.{fmt}"
-        extract_and_write_frame(video, t, out_path, args.quality, args.scale_width, fmt, args.dry_run)
+    # Frames on disk are only reused when the last completed run into outdir used
+    # this exact video file and the same image settings
+    video_stat = video.stat()
+    manifest = {
+        "video": str(video.resolve()),
+        "size": video_stat.st_size,
+        "mtime": video_stat.st_mtime,
+        "prefix": args.prefix,
+        "format": fmt,
+        "quality": args.quality,
+        "scale_width": args.scale_width,
+        "backend": args.backend,
+        "keyframes_only": args.keyframes_only,
+    }
+    manifest_path = outdir / KEYFRAMES_MANIFEST
+    previous = read_manifest(outdir)
+    skipped = 0
+    if not args.force and {k: previous.get(k) for k in manifest} == manifest:
+        pending = [t for t in to_extract if not (outdir / f"{args.prefix}.{t}.{fmt}").exists()]
+        skipped = len(to_extract) - len(pending)
+        to_extract = pending
+    elif not args.dry_run:
+        # The frames on disk don't match until this run completes
+        manifest_path.unlink(missing_ok=True)
 
-    print(f"Saved {len(to_extract)} frames to {outdir}")
+    # Extract frames
+    write_params = imwrite_params(fmt, args.quality)
+    if args.keyframes_only and args.backend == "opencv":
+        eprint("Warning: --keyframes_only is not supported with --backend opencv; decoding every frame.")
+    if to_extract and args.backend == "ffmpeg" and args.keyframes_only:
+        run_ffmpeg_keyframes_extract(video, to_extract, outdir, args.prefix, fmt, args.quality, args.scale_width, args.dry_run, args.hwaccel)
+    elif to_extract and args.backend == "ffmpeg":
+        run_ffmpeg_extract(video, to_extract, outdir, args.prefix, fmt, args.quality, args.scale_width, args.dry_run, args.hwaccel)
+    elif to_extract and args.backend == "av":
+        if args.hwaccel:
+            eprint("Warning: --hwaccel is not supported with --backend av; decoding in software.")
+        extract_in_parallel(run_av_extract, video, to_extract, args.jobs, outdir, args.prefix, write_params, args.scale_width, fmt, args.dry_run, args.keyframes_only)
+    elif to_extract:
+        extract_in_parallel(extract_many_frames, video, to_extract, args.jobs, outdir, args.prefix, write_params, args.scale_width, fmt, args.dry_run, args.hwaccel)
+
+    if not args.dry_run:
+        manifest_path.write_text(json.dumps({**manifest, "source_digest": source_digest}, indent=2), encoding="utf-8")
+
+    print(f"Saved {len(to_extract)} frames to {outdir}" + (f" ({skipped} already present; use --force to rewrite)" if skipped else ""))
     print(f"All keyframes index: {csv_index}")
     if args.match_phrases:
         print(f"Phrase map: {outdir/'phrase_keyframe_map.csv'}")
@@ -1,6 +1,9 @@
+import math
+import os
 import streamlit as st
 import pandas as pd
 from pathlib import Path
+from PIL import Image
 
 st.set_page_config(page_title="Content Understanding — Keyframes", layout="wide")
 st.title("Content Understanding Demo")
@@ -16,15 +19,88 @@ frames_dir_str = st.text_input(
 )
 FRAMES_DIR = Path(frames_dir_str)
 CSV_PATH = FRAMES_DIR / "phrase_keyframe_map.csv"
+PAGE_SIZE = 25
+THUMB_WIDTH = 280
+ROWS_PER_GROUP = 4
+
+# Only the columns the page displays are loaded
+DISPLAY_COLUMNS = ["matched_filename", "phrase_text", "phrase_idx", "start_tc", "end_tc", "matched_keyframe_tc"]
+# Explicit dtypes for the C-engine fallback so pandas skips type inference
+CSV_DTYPES = {
+    "phrase_idx": "int32",
+    "phrase_text": "string",
+    "start_tc": "string",
+    "end_tc": "string",
+    "matched_keyframe_tc": "string",
+    "matched_filename": "string",
+}
+# Arrow infers column types, so an all-empty or all-digit text column comes back
+# as null/int64; these are cast back to strings before any .str use
+TEXT_COLUMNS = ["phrase_text", "matched_filename"]
 
 @st.cache_data
-def load_mappings(path: Path):
-    df = pd.read_csv(path)
-    # Ensure the filename column exists and strip whitespace
-    if "matched_filename" in df.columns:
-        df["matched_filename"] = df["matched_filename"].astype(str).str.strip()
+def load_mappings(path: str, mtime: float):
+    # `mtime` is only part of the cache key, so a rewritten CSV is reloaded
+    path = Path(path)
+    # extract_keyframes.py writes a Parquet copy next to the CSV; use it when current
+    parquet = path.with_suffix(".parquet")
+    df = None
+    if parquet.exists() and parquet.stat().st_mtime >= path.stat().st_mtime:
+        try:
+            import pyarrow.parquet as pq
+            present = [c for c in DISPLAY_COLUMNS if c in pq.read_schema(parquet).names]
+            df = pd.read_parquet(parquet, columns=present, dtype_backend="pyarrow")
+            df = df.astype({c: "string[pyarrow]" for c in TEXT_COLUMNS if c in present})
+        except ImportError:
+            pass
+    if df is None:
+        # Only ask for columns the file has; missing ones are filled in below
+        header = pd.read_csv(path, nrows=0).columns
+        present = [c for c in DISPLAY_COLUMNS if c in header]
+        try:
+            # Arrow's multithreaded CSV reader, keeping Arrow-backed columns
+            df = pd.read_csv(path, engine="pyarrow", usecols=present, dtype_backend="pyarrow")
+            df = df.astype({c: "string[pyarrow]" for c in TEXT_COLUMNS if c in present})
+        except ImportError:
+            df = pd.read_csv(path, usecols=present, dtype={c: CSV_DTYPES[c] for c in present})
+    # Older or hand-edited maps may lack a column; show those fields as blank
+    for col in DISPLAY_COLUMNS:
+        if col not in df.columns:
+            df[col] = pd.Series("", index=df.index, dtype="string")
+    # Strip whitespace from filenames
+    df["matched_filename"] = df["matched_filename"].fillna("").str.strip()
+    # Lower-case once so searches are a plain substring test on every keystroke
+    df["phrase_text_lc"] = df["phrase_text"].fillna("").str.lower()
     return df
 
+@st.cache_data(ttl=5)
+def list_frames(dir_str: str, dir_mtime: float) -> set:
+    """Names of the files in `dir_str`, from one directory listing.
+
+    Keyed on the directory mtime, which changes whenever frames are added
+    or removed; the short TTL covers filesystems with coarse directory mtimes.
+    is_file() uses the entry type from the listing, so no per-file stat()."""
+    with os.scandir(dir_str) as it:
+        return {e.name for e in it if e.is_file()}
+
+@st.cache_resource
+def get_thumb(path: str, mtime: float, width: int = THUMB_WIDTH) -> str:
+    """Return a display-size JPEG of `path`, written once to a .thumbs folder
+    beside it so reruns don't re-decode and resize the full-size frame."""
+    src = Path(path)
+    thumb = src.parent / ".thumbs" / f"{src.stem}.{width}.jpg"
+    if not thumb.exists() or thumb.stat().st_mtime < mtime:
+        thumb.parent.mkdir(exist_ok=True)
+        with Image.open(src) as img:
+            img.thumbnail((width, width * 10))
+            img.convert("RGB").save(thumb, "JPEG", quality=80)
+    return str(thumb)
+
+@st.cache_resource
+def get_placeholder(width: int = THUMB_WIDTH) -> Image.Image:
+    """Blank 16:9 tile shown for missing frames so each row still gets a captioned image."""
+    return Image.new("RGB", (width, width * 9 // 16), (230, 230, 230))
+
 # Simple monitor behavior: check for the CSV and offer a manual refresh
 if not CSV_PATH.exists():
     st.warning(f"Waiting for mapping file: `{CSV_PATH}`")
@@ -33,33 +109,51 @@ if not CSV_PATH.exists():
     st.stop()
 
 try:
-    df = load_mappings(CSV_PATH)
+    df = load_mappings(str(CSV_PATH), CSV_PATH.stat().st_mtime)
+    frames = list_frames(str(FRAMES_DIR), FRAMES_DIR.stat().st_mtime)
 except FileNotFoundError:
     st.error(f"Mapping file not found: {CSV_PATH}")
     st.stop()
 
 search = st.text_input("Object Search: ", "")
 if search:
-    filtered = df[df["phrase_text"].str.contains(search, case=False, na=False)]
+    filtered = df[df["phrase_text_lc"].str.contains(search.lower(), regex=False, na=False)]
 else:
     filtered = df
 
-st.write(f"Showing {len(filtered)} of {len(df)} mappings")
+# Only render one page of rows so reruns scale with PAGE_SIZE, not the match count
+page_count = max(1, math.ceil(len(filtered) / PAGE_SIZE))
+page = int(st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, value=1, step=1))
+page_rows = filtered.iloc[(page - 1) * PAGE_SIZE : page * PAGE_SIZE]
+
+st.write(f"Showing {len(page_rows)} of {len(filtered)} matching ({len(df)} total) mappings")
 
-for _, row in filtered.iterrows():
-    cols = st.columns([1, 2])
-    img_path = FRAMES_DIR / row.get("matched_filename", "")
-    with cols[0]:
-        if img_path.exists():
-            # Use a fixed width to make images smaller on the page
-            st.image(str(img_path), width=280, caption=row.get("matched_filename"))
+# Render each group as one st.image call for the frames plus a row of text columns.
+# The image grid and the columns don't line up exactly, so captions and
+# subheaders both carry the phrase index to pair them.
+rows = list(page_rows.itertuples(index=False))
+for start in range(0, len(rows), ROWS_PER_GROUP):
+    group = rows[start : start + ROWS_PER_GROUP]
+    images, captions = [], []
+    for row in group:
+        filename = str(getattr(row, "matched_filename", ""))
+        label = f"#{getattr(row, 'phrase_idx', '')} {getattr(row, 'phrase_text', '')}"
+        if filename in frames:
+            # Only this page's frames are stat()ed, for the thumbnail cache key
+            img_path = FRAMES_DIR / filename
+            images.append(get_thumb(str(img_path), img_path.stat().st_mtime))
+            captions.append(f"{label} · {filename}")
         else:
-            st.warning(f"Image not found: {img_path.name}")
-    with cols[1]:
-        st.subheader(row.get("phrase_text", ""))
-        st.write("**Phrase index:**", row.get("phrase_idx", ""))
-        st.write("**Start:**", row.get("start_tc", ""), " — **End:**", row.get("end_tc", ""))
-        st.write("**Matched keyframe timecode:**", row.get("matched_keyframe_tc", ""))
-        st.markdown("---")
+            images.append(get_placeholder())
+            captions.append(f"{label} · Image not found: {filename}")
+    # Use a fixed width to make images smaller on the page
+    st.image(images, width=THUMB_WIDTH, caption=captions)
+    for col, row in zip(st.columns(ROWS_PER_GROUP), group):
+        with col:
+            st.subheader(f"#{getattr(row, 'phrase_idx', '')} {getattr(row, 'phrase_text', '')}")
+            st.write("**Phrase index:**", getattr(row, "phrase_idx", ""))
+            st.write("**Start:**", getattr(row, "start_tc", ""), " — **End:**", getattr(row, "end_tc", ""))
+            st.write("**Matched keyframe timecode:**", getattr(row, "matched_keyframe_tc", ""))
+    st.markdown("---")
 
 st.caption("Tip: Click **Refresh** in your browser or hit **R** to re-run after new results are written.")
@@ -261,6 +261,8 @@ def normalize_to_custom_schema(service_result: dict[str, Any]) -> dict[str, Any]
 # ----------------------- Main -------------------------------
 
 def run_video_analysis(fileName: str = None):
+    """Analyze `fileName` (or the default file_urls) and return the raw result
+    of the last file processed, or None when there was nothing to process."""
     os.makedirs("video_analysis_result", exist_ok=True)
 
     # Prepare client once
@@ -283,6 +285,7 @@ def run_video_analysis(fileName: str = None):
     if fileName:
         file_urls.append(fileName)
 
+    result = None
     for file_url in file_urls:
         print(f"Processing file: {file_url}")
         # Start job
@@ -303,6 +306,7 @@ def run_video_analysis(fileName: str = None):
         print(f"Finished processing file: {file_url}\n  - Raw: {raw_path}\n  - Normalized: {norm_path}")
 
     print("All files processed.")
+    return result
 
 
 